@@ -0,0 +1,11 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class NumpyORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that serializes numpy scalars and arrays natively."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
@@ -1,76 +1,110 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict
 import asyncio
-from loguru import logger
 
+from app.api.responses import NumpyORJSONResponse
 from app.config import get_settings
+from app.services.batcher import BatcherOverloaded
+from app.services.cache import ResponseCache
 
 settings = get_settings()
 router = APIRouter()
 
+# Keep references to in-flight training jobs so they aren't garbage collected
+training_jobs: set[asyncio.Task] = set()
+
 
 # Request/Response models
 class PredictionRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     boardId: str
     timeHorizon: str = "2weeks"
-    metrics: List[str] = ["velocity", "completion", "risk"]
-    velocityHistory: List[Dict[str, Any]]
-    currentTasks: List[Dict[str, Any]]
+    metrics: list[str] = ["velocity", "completion", "risk"]
+    velocityHistory: list
+    currentTasks: list
 
 
 class PredictionResponse(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     boardId: str
     timeHorizon: str
-    predictions: Dict[str, Any]
+    predictions: dict[str, Any]
     confidence: float
     generatedAt: str
     modelVersion: str
 
 
 class RiskAnalysisRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     boardId: str
-    tasks: List[Dict[str, Any]]
-    factors: List[str] = ["deadline", "complexity", "assignee_workload"]
+    tasks: list
+    factors: list[str] = ["deadline", "complexity", "assignee_workload"]
 
 
 class RiskAnalysisResponse(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     boardId: str
-    risks: List[Dict[str, Any]]
-    summary: Dict[str, Any]
-    recommendations: List[str]
+    risks: list[dict[str, Any]]
+    summary: dict[str, Any]
+    recommendations: list[str]
 
 
 class TrainingRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
     boardId: Optional[str] = None
-    velocityData: Optional[List[Dict[str, Any]]] = None
-    tasksData: Optional[List[Dict[str, Any]]] = None
+    velocityData: Optional[list] = None
+    tasksData: Optional[list] = None
     forceRetrain: bool = False
 
 
-# Dependency to get services from app state
-def get_velocity_predictor(request: Request):
-    return request.app.state.velocity_predictor
+# (condition, message) pairs evaluated against a risk summary
+RECOMMENDATION_RULES = (
+    (lambda summary: summary["high_risk_count"] > 0,
+     "Immediate attention needed for {high_risk_count} high-risk tasks"),
+    (lambda summary: summary["average_risk_score"] > 0.6,
+     "Overall board risk is elevated - consider workload redistribution"),
+    (lambda summary: summary["risk_distribution"]["high"] > 0.2,
+     "High percentage of risky tasks - review sprint planning"),
+)
 
 
-def get_risk_analyzer(request: Request):
-    return request.app.state.risk_analyzer
-
-
-def get_training_service(request: Request):
-    return request.app.state.training_service
+def cache_headers(cache_key: str) -> dict[str, str]:
+    """Expose the cache key to HTTP-layer caches."""
+    return {
+        "ETag": f'"{cache_key}"',
+        "Cache-Control": f"private, max-age={settings.CACHE_TTL}",
+    }
 
 
 @router.post("/predict", response_model=PredictionResponse)
 async def predict_velocity(
     request: PredictionRequest,
-    velocity_predictor=Depends(get_velocity_predictor)
+    http_request: Request
 ):
-    # Make prediction
-    prediction_result = await velocity_predictor.predict(
-        recent_data=request.velocityHistory,
-        time_horizon=request.timeHorizon
-    )
+    # Serve identical requests from cache
+    cache = http_request.app.state.response_cache
+    cache_key = ResponseCache.make_key("predict", request.model_dump())
+
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return NumpyORJSONResponse(content=cached, headers=cache_headers(cache_key))
+
+    # Make prediction (coalesced with concurrent requests)
+    try:
+        prediction_result = await http_request.app.state.velocity_batcher.submit({
+            "recent_data": request.velocityHistory,
+            "time_horizon": request.timeHorizon,
+        })
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Prediction queue is full, retry later")
+    except BatcherOverloaded:
+        raise HTTPException(status_code=429, detail="Prediction service is overloaded, retry later")
 
     # Format response
     predictions = {
@@ -81,9 +115,19 @@ async def predict_velocity(
         }
     }
 
+    # Count open and high-priority tasks in a single pass
+    metrics = set(request.metrics)
+    total_tasks = high_priority_tasks = 0
+    for task in request.currentTasks:
+        if not isinstance(task, dict):
+            raise HTTPException(status_code=422, detail="currentTasks must be a list of objects")
+        if not task.get('completedAt'):
+            total_tasks += 1
+        if task.get('priority') == 'high':
+            high_priority_tasks += 1
+
     # Add completion predictions if requested
-    if "completion" in request.metrics:
-        total_tasks = len([task for task in request.currentTasks if not task.get('completedAt')])
+    if "completion" in metrics:
         predicted_completion = min(total_tasks, int(prediction_result["predicted_velocity"] * 2))
 
         predictions["completion"] = {
@@ -93,8 +137,7 @@ async def predict_velocity(
         }
 
     # Add basic risk prediction if requested
-    if "risk" in request.metrics:
-        high_priority_tasks = len([task for task in request.currentTasks if task.get('priority') == 'high'])
+    if "risk" in metrics:
         risk_score = min(1.0, high_priority_tasks / max(len(request.currentTasks), 1))
 
         predictions["risk"] = {
@@ -103,85 +146,85 @@ async def predict_velocity(
             "highPriorityTasks": high_priority_tasks,
         }
 
-    return PredictionResponse(
-        boardId=request.boardId,
-        timeHorizon=request.timeHorizon,
-        predictions=predictions,
-        confidence=prediction_result["confidence"],
-        generatedAt=prediction_result["prediction_date"],
-        modelVersion=settings.MODEL_VERSION
-    )
+    # Model outputs may be numpy values; serialize them as-is instead of
+    # re-validating through PredictionResponse
+    payload = {
+        "boardId": request.boardId,
+        "timeHorizon": request.timeHorizon,
+        "predictions": predictions,
+        "confidence": prediction_result["confidence"],
+        "generatedAt": prediction_result["prediction_date"],
+        "modelVersion": settings.MODEL_VERSION,
+    }
+    await cache.set(cache_key, payload)
+
+    return NumpyORJSONResponse(content=payload, headers=cache_headers(cache_key))
 
 
 @router.post("/analyze-risk", response_model=RiskAnalysisResponse)
 async def analyze_risk(
     request: RiskAnalysisRequest,
-    risk_analyzer=Depends(get_risk_analyzer)
+    http_request: Request
 ):
-    # Perform risk analysis
-    analysis_result = await risk_analyzer.analyze_risk(
-        tasks=request.tasks,
-        board_context={}  # Could be enhanced with board-specific context
-    )
+    # Serve identical requests from cache
+    cache = http_request.app.state.response_cache
+    cache_key = ResponseCache.make_key("analyze-risk", request.model_dump())
+
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return NumpyORJSONResponse(content=cached, headers=cache_headers(cache_key))
+
+    # Perform risk analysis (coalesced with concurrent requests)
+    try:
+        analysis_result = await http_request.app.state.risk_batcher.submit({
+            "tasks": request.tasks,
+            "board_context": {},  # Could be enhanced with board-specific context
+        })
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Risk analysis queue is full, retry later")
+    except BatcherOverloaded:
+        raise HTTPException(status_code=429, detail="Risk analysis service is overloaded, retry later")
 
     # Generate recommendations based on risk analysis
-    recommendations = []
     summary = analysis_result["summary"]
+    recommendations = [message.format_map(summary) for condition, message in RECOMMENDATION_RULES if condition(summary)]
 
-    if summary["high_risk_count"] > 0:
-        recommendations.append(f"Immediate attention needed for {summary['high_risk_count']} high-risk tasks")
-
-    if summary["average_risk_score"] > 0.6:
-        recommendations.append("Overall board risk is elevated - consider workload redistribution")
-
-    if summary["risk_distribution"]["high"] > 0.2:
-        recommendations.append("High percentage of risky tasks - review sprint planning")
+    payload = {
+        "boardId": request.boardId,
+        "risks": analysis_result["risks"],
+        "summary": analysis_result["summary"],
+        "recommendations": recommendations,
+    }
+    await cache.set(cache_key, payload)
 
-    return RiskAnalysisResponse(
-        boardId=request.boardId,
-        risks=analysis_result["risks"],
-        summary=analysis_result["summary"],
-        recommendations=recommendations
-    )
+    return NumpyORJSONResponse(content=payload, headers=cache_headers(cache_key))
 
 
 @router.post("/train")
 async def train_models(
     request: TrainingRequest,
-    background_tasks: BackgroundTasks,
-    velocity_predictor=Depends(get_velocity_predictor),
-    risk_analyzer=Depends(get_risk_analyzer)
+    http_request: Request
 ):
-    # Start training in background
-    async def train_models_background():
-        results = {}
-
-        # Train velocity predictor if data provided
-        if request.velocityData:
-            try:
-                velocity_metrics = await velocity_predictor.train(
-                    velocity_data=request.velocityData,
-                    board_id=request.boardId
-                )
-                results["velocity_model"] = velocity_metrics
-            except Exception as e:
-                results["velocity_model"] = {"error": str(e)}
-
-        # Train risk analyzer if data provided
-        if request.tasksData:
-            try:
-                risk_metrics = await risk_analyzer.train(
-                    tasks_data=request.tasksData,
-                    board_id=request.boardId
-                )
-                results["risk_model"] = risk_metrics
-            except Exception as e:
-                results["risk_model"] = {"error": str(e)}
-
-        return results
-
-    # Add to background tasks
-    background_tasks.add_task(train_models_background)
+    # Goes through the training service so it queues behind, or joins, any
+    # other training run instead of writing the same checkpoints concurrently
+    training_service = http_request.app.state.training_service
+    if request.velocityData or request.tasksData:
+        job = training_service.train_on_data(
+            request.velocityData,
+            request.tasksData,
+            board_id=request.boardId,
+            force=request.forceRetrain,
+        )
+    elif request.boardId is None:
+        # Nothing supplied: retrain the served models from the database instead
+        job = training_service.retrain_models(force=request.forceRetrain)
+    else:
+        # A per-board fit from the database would never be served
+        raise HTTPException(status_code=400, detail="velocityData or tasksData is required when boardId is set")
+
+    training_task = asyncio.create_task(job)
+    training_jobs.add(training_task)
+    training_task.add_done_callback(training_jobs.discard)
 
     return {
         "message": "Training started in background",
@@ -191,13 +234,13 @@ async def train_models(
 
 
 @router.get("/model/status")
-async def get_model_status(
-    velocity_predictor=Depends(get_velocity_predictor),
-    risk_analyzer=Depends(get_risk_analyzer)
-):
+async def get_model_status(http_request: Request):
+    # Services are app-wide singletons, so read them straight from app state
+    state = http_request.app.state
+
     # Get current model status and information
-    velocity_info = await velocity_predictor.get_model_info()
-    risk_info = await risk_analyzer.get_model_info()
+    velocity_info = await state.velocity_predictor.get_model_info()
+    risk_info = await state.risk_analyzer.get_model_info()
 
     return {
         "velocity_model": velocity_info,
@@ -205,5 +248,6 @@ async def get_model_status(
         "service_version": settings.MODEL_VERSION,
         "features": {
             "velocity_prediction": velocity_info["is_trained"],
-            "risk_analysis
-
+            "risk_analysis": risk_info["is_trained"],
+        }
+    }
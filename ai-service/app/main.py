@@ -1,8 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import uvicorn
 import asyncio
+import functools
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
 from loguru import logger
 
@@ -11,13 +14,76 @@ from app.models.predictor import VelocityPredictor
 from app.models.risk_analyzer import RiskAnalyzer
 from app.services.data_service import DataService
 from app.services.training_service import TrainingService
+from app.services.batcher import DynamicBatcher
+from app.services.cache import ResponseCache
 from app.api.routes import router
+from app.api.responses import NumpyORJSONResponse
 from app.middleware.auth import auth_middleware
 from app.middleware.metrics import metrics_middleware
 
 settings = get_settings()
 
 
+def setup_logging():
+    """Configure loguru to write through a background queue."""
+    logger.remove()
+    logger.add(
+        sys.stdout,
+        level=settings.LOG_LEVEL,
+        serialize=settings.LOG_FORMAT == "json",
+        # Handlers only enqueue records; a worker thread does the writing
+        enqueue=True,
+        # Variable inspection on exceptions is slow, keep it to development
+        backtrace=settings.DEBUG,
+        diagnose=settings.DEBUG,
+    )
+
+
+def create_velocity_batch_handler(velocity_predictor):
+    """Build the batch handler for velocity predictions."""
+    async def handler(payloads):
+        if hasattr(velocity_predictor, "predict_batch"):
+            return await velocity_predictor.predict_batch(payloads)
+        return await asyncio.gather(
+            *(velocity_predictor.predict(**payload) for payload in payloads),
+            return_exceptions=True,
+        )
+    return handler
+
+
+def create_risk_batch_handler(risk_analyzer):
+    """Build the batch handler for risk analysis."""
+    async def handler(payloads):
+        if hasattr(risk_analyzer, "analyze_risk_batch"):
+            return await risk_analyzer.analyze_risk_batch(payloads)
+        return await asyncio.gather(
+            *(risk_analyzer.analyze_risk(**payload) for payload in payloads),
+            return_exceptions=True,
+        )
+    return handler
+
+
+def batch_wait_time(model, batch_method: str) -> float:
+    """How long a batcher should hold a request open for others to join it."""
+    # Without a vectorized batch method requests are fanned out one by one
+    # anyway, so waiting for a batch to fill only adds latency
+    if hasattr(model, batch_method):
+        return settings.INFERENCE_MAX_WAIT_MS / 1000
+    return 0
+
+
+async def reload_serving_models(app: FastAPI, kinds: set):
+    """Load freshly saved checkpoints into the serving models."""
+    if "velocity" in kinds:
+        await app.state.velocity_predictor.load_model()
+    if "risk" in kinds:
+        await app.state.risk_analyzer.load_model()
+    
+    # Cached responses came from the previous models
+    await app.state.response_cache.clear()
+    logger.info("✅ Reloaded serving models: {}", sorted(kinds))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
@@ -27,7 +93,22 @@ async def lifespan(app: FastAPI):
     app.state.data_service = DataService()
     app.state.velocity_predictor = VelocityPredictor()
     app.state.risk_analyzer = RiskAnalyzer()
-    app.state.training_service = TrainingService()
+    app.state.train_pool = ProcessPoolExecutor(max_workers=settings.TRAINING_WORKERS)
+    app.state.training_service = TrainingService(
+        app.state.data_service,
+        on_models_saved=functools.partial(reload_serving_models, app),
+        process_pool=app.state.train_pool,
+    )
+    app.state.response_cache = ResponseCache(
+        maxsize=settings.RESPONSE_CACHE_SIZE,
+        ttl=settings.CACHE_TTL,
+    )
+    
+    # Warm up database pool and HTTP client
+    try:
+        await app.state.data_service.initialize()
+    except Exception as e:
+        logger.warning("⚠️ Database unavailable, falling back to API: {}", e)
     
     # Load models
     try:
@@ -35,9 +116,29 @@ async def lifespan(app: FastAPI):
         await app.state.risk_analyzer.load_model()
         logger.info("✅ Models loaded successfully")
     except Exception as e:
-        logger.warning(f"⚠️ Failed to load models: {e}")
+        logger.warning("⚠️ Failed to load models: {}", e)
         logger.info("🔄 Will train new models on first request")
     
+    # Start inference batchers
+    app.state.velocity_batcher = DynamicBatcher(
+        "velocity",
+        create_velocity_batch_handler(app.state.velocity_predictor),
+        max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_time=batch_wait_time(app.state.velocity_predictor, "predict_batch"),
+        max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+        target_latency=settings.INFERENCE_TARGET_LATENCY_MS / 1000,
+    )
+    app.state.risk_batcher = DynamicBatcher(
+        "risk",
+        create_risk_batch_handler(app.state.risk_analyzer),
+        max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_time=batch_wait_time(app.state.risk_analyzer, "analyze_risk_batch"),
+        max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+        target_latency=settings.INFERENCE_TARGET_LATENCY_MS / 1000,
+    )
+    app.state.velocity_batcher.start()
+    app.state.risk_batcher.start()
+    
     # Start background training scheduler
     if settings.ENABLE_RETRAINING:
         training_task = asyncio.create_task(
@@ -56,23 +157,29 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
     
-    # Save models before shutdown
-    try:
-        await app.state.velocity_predictor.save_model()
-        await app.state.risk_analyzer.save_model()
-        logger.info("✅ Models saved successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to save models: {e}")
+    await app.state.velocity_batcher.stop()
+    await app.state.risk_batcher.stop()
+    app.state.train_pool.shutdown(wait=False, cancel_futures=True)
+    await app.state.data_service.close()
+    
+    # Models are saved by whichever training path produced them; saving the
+    # serving copies here would overwrite newer checkpoints
+    
+    # Flush records still waiting in the logging queue
+    await logger.complete()
 
 
 def create_app() -> FastAPI:
     """Create FastAPI application."""
     
+    setup_logging()
+    
     app = FastAPI(
         title="KanOpt AI Service",
         description="LSTM-based velocity prediction and risk analysis for Kanban boards",
         version=settings.MODEL_VERSION,
         lifespan=lifespan,
+        default_response_class=NumpyORJSONResponse,
         docs_url="/docs" if settings.DEBUG else None,
         redoc_url="/redoc" if settings.DEBUG else None,
     )
@@ -128,14 +235,14 @@ def create_app() -> FastAPI:
                 "next_training": None,  
             }
         except Exception as e:
-            logger.error(f"Failed to get model info: {e}")
+            logger.error("Failed to get model info: {}", e)
             raise HTTPException(status_code=500, detail="Failed to get model information")
     
     # Global exception handler
     @app.exception_handler(Exception)
     async def global_exception_handler(request, exc):
-        logger.error(f"Unhandled exception: {exc}")
-        return JSONResponse(
+        logger.error("Unhandled exception: {}", exc)
+        return ORJSONResponse(
             status_code=500,
             content={"detail": "Internal server error"}
         )
@@ -148,9 +255,13 @@ app = create_app()
 
 if __name__ == "__main__":
     uvicorn.run(
-        "main:app",
+        "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
+        # reload and multiple workers are mutually exclusive
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        loop="uvloop",
+        http="httptools",
         log_level=settings.LOG_LEVEL.lower(),
     )
@@ -1,14 +1,22 @@
 from fastapi import Request, HTTPException
+import hashlib
+import hmac
 from app.config import get_settings
 
 settings = get_settings()
 
+# Paths that never require an API key
+PUBLIC_PATHS = frozenset({"/health", "/docs", "/redoc", "/openapi.json"})
+
+# Compare fixed-length digests so the check is constant-time
+_EXPECTED_KEY_DIGEST = hashlib.sha256(settings.API_KEY.encode()).digest() if settings.API_KEY else None
+
 
 async def auth_middleware(request: Request, call_next):
     """Authentication middleware for API key validation."""
     
     # Skip auth for health and docs endpoints
-    if request.url.path in ["/health", "/docs", "/redoc", "/openapi.json"]:
+    if request.url.path in PUBLIC_PATHS:
         response = await call_next(request)
         return response
     
@@ -18,7 +26,8 @@ async def auth_middleware(request: Request, call_next):
     if not api_key:
         raise HTTPException(status_code=401, detail="API key required")
     
-    if api_key != settings.API_KEY:
+    provided_digest = hashlib.sha256(api_key.encode()).digest()
+    if _EXPECTED_KEY_DIGEST is None or not hmac.compare_digest(provided_digest, _EXPECTED_KEY_DIGEST):
         raise HTTPException(status_code=403, detail="Invalid API key")
     
     response = await call_next(request)
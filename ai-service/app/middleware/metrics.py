@@ -1,5 +1,6 @@
 from fastapi import Request
 import time
+from functools import lru_cache
 from prometheus_client import Counter, Histogram, generate_latest
 from prometheus_client import CONTENT_TYPE_LATEST
 
@@ -7,19 +8,30 @@ from prometheus_client import CONTENT_TYPE_LATEST
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status_code'])
 REQUEST_DURATION = Histogram('http_request_duration_seconds', 'HTTP request duration', ['method', 'endpoint'])
 
+# Paths that are never recorded
+SKIP_PATHS = frozenset({"/health", "/metrics"})
+
+
+@lru_cache(maxsize=512)
+def _request_counter(method: str, endpoint: str, status_code: int):
+    return REQUEST_COUNT.labels(method=method, endpoint=endpoint, status_code=status_code)
+
+
+@lru_cache(maxsize=512)
+def _request_duration(method: str, endpoint: str):
+    return REQUEST_DURATION.labels(method=method, endpoint=endpoint)
+
 
 async def metrics_middleware(request: Request, call_next):
     """Metrics collection middleware."""
-    
-    start_time = time.time()
+
+    # Skip metrics for health and metrics endpoints
+    if request.url.path in SKIP_PATHS:
+        return await call_next(request)
+
+    start_time = time.perf_counter()
     method = request.method
-    endpoint = request.url.path
-    
-    # Skip metrics for metrics endpoint
-    if endpoint == "/metrics":
-        response = await call_next(request)
-        return response
-    
+
     try:
         response = await call_next(request)
         status_code = response.status_code
@@ -27,11 +39,13 @@ async def metrics_middleware(request: Request, call_next):
         status_code = 500
         raise e
     finally:
-        # Record metrics
-        duration = time.time() - start_time
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint, status_code=status_code).inc()
-        REQUEST_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
-    
+        # Record metrics against the route template to bound label cardinality
+        duration = time.perf_counter() - start_time
+        route = request.scope.get("route")
+        endpoint = route.path if route else request.url.path
+        _request_counter(method, endpoint, status_code).inc()
+        _request_duration(method, endpoint).observe(duration)
+
     return response
 
 
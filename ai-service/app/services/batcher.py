@@ -0,0 +1,164 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+BatchHandler = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class BatcherOverloaded(Exception):
+    """Raised when queued work would exceed the latency target."""
+
+
+class DynamicBatcher:
+    """Coalesce concurrent requests into a single model call.
+
+    The batch size adapts to keep P95 batch latency under ``target_latency``,
+    and new requests are rejected once the estimated queueing delay would
+    exceed ``max_wait_time + target_latency``. A handler may return an
+    exception in place of a result to fail only that request.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: BatchHandler,
+        max_batch_size: int = 16,
+        max_wait_time: float = 0.02,
+        max_queue_size: int = 100,
+        target_latency: float = 0.1,
+    ):
+        self.name = name
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self.target_latency = target_latency
+        self.current_max_batch = max_batch_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._worker: Optional[asyncio.Task] = None
+
+        # Rolling window of recent batch latencies and per-item service times
+        self._batch_latencies: deque = deque(maxlen=200)
+        self._item_service_times: deque = deque(maxlen=200)
+        self._avg_service_time = 0.0
+
+    def start(self):
+        """Start the batching loop."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # Don't leave callers waiting on requests that will never run
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, payload: Any) -> Any:
+        """Queue a payload and wait for its result.
+
+        Raises ``asyncio.QueueFull`` when the queue is saturated and
+        ``BatcherOverloaded`` when the queue cannot drain within the latency
+        target, so callers can apply backpressure.
+        """
+        # Little's Law: expected wait is queue length times per-item service time
+        if self._queue.qsize() * self._avg_service_time > self.max_wait_time + self.target_latency:
+            raise BatcherOverloaded(f"{self.name} batcher is over its latency target")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((payload, future))
+        return await future
+
+    async def _run(self):
+        """Collect batches from the queue and dispatch them."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait_time
+
+                while len(batch) < self.current_max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    except asyncio.QueueEmpty:
+                        pass
+
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self._process(batch)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+
+    async def _process(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Run the handler on a batch and resolve each request's future."""
+        # Drop requests whose callers have already gone away
+        batch = [(payload, future) for payload, future in batch if not future.done()]
+        if not batch:
+            return
+
+        start_time = time.perf_counter()
+        try:
+            results = await self.handler([payload for payload, _ in batch])
+        except Exception as e:
+            logger.error("❌ {} batch of {} failed: {}", self.name, len(batch), e)
+            self._fail(batch, e)
+            return
+        finally:
+            self._record_latency(time.perf_counter() - start_time, len(batch))
+
+        if len(results) != len(batch):
+            self._fail(batch, RuntimeError(
+                f"{self.name} handler returned {len(results)} results for {len(batch)} inputs"
+            ))
+            return
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[Any, asyncio.Future]], error: Exception):
+        """Fail every pending request in a batch."""
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _record_latency(self, latency: float, batch_size: int):
+        """Track batch latency and resize batches towards the latency target."""
+        self._batch_latencies.append(latency)
+        self._item_service_times.append(latency / batch_size)
+        self._avg_service_time = float(np.mean(self._item_service_times))
+
+        p95 = np.percentile(self._batch_latencies, 95)
+        if p95 > self.target_latency and self.current_max_batch > 1:
+            self.current_max_batch -= 1
+        elif p95 < 0.7 * self.target_latency and self.current_max_batch < self.max_batch_size:
+            self.current_max_batch += 1
@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+
+import orjson
+from cachetools import TTLCache
+
+
+class ResponseCache:
+    """In-memory TTL cache for idempotent inference responses."""
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def make_key(namespace: str, payload: Dict[str, Any]) -> str:
+        """Hash a request payload into a stable cache key."""
+        digest = hashlib.blake2b(namespace.encode(), digest_size=16)
+        digest.update(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS))
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a cached response, resetting its TTL on hit."""
+        async with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                # Re-insert so frequently polled entries stay warm (TTL-R)
+                self._cache[key] = value
+            return value
+
+    async def set(self, key: str, value: Any):
+        """Store a response."""
+        async with self._lock:
+            self._cache[key] = value
+
+    async def clear(self):
+        """Drop all cached responses."""
+        async with self._lock:
+            self._cache.clear()
@@ -1,7 +1,9 @@
 import asyncio
+import time
 import asyncpg
 import httpx
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, AsyncIterator
 from datetime import datetime, timedelta
 from loguru import logger
 
@@ -9,6 +11,48 @@ from app.config import get_settings
 
 settings = get_settings()
 
+# Rows fetched per round-trip when streaming through a cursor
+STREAM_PREFETCH = 1000
+
+# Minimum seconds between attempts to reconnect a missing database pool
+DB_RECONNECT_INTERVAL = 30
+
+
+def _velocity_row(row) -> Dict[str, Any]:
+    return {
+        'sprint_week': row['sprint_week'],
+        'velocity': float(row['velocity']),
+        'completed': row['completed'],
+        'total_story_points': row['total_points'],
+        'cycle_time': float(row['cycle_time']),
+        'throughput': row['throughput'],
+        'created_at': row['created_at'].isoformat(),
+    }
+
+
+def _task_row(row) -> Dict[str, Any]:
+    return {
+        'id': str(row['id']),
+        'title': row['title'],
+        'description': row['description'] or '',
+        'priority': row['priority'],
+        'storyPoints': row['story_points'],
+        'assigneeId': str(row['assignee_id']) if row['assignee_id'] else None,
+        'dueDate': row['due_date'].isoformat() if row['due_date'] else None,
+        'createdAt': row['created_at'].isoformat(),
+        'updatedAt': row['updated_at'].isoformat(),
+        'completedAt': row['completed_at'].isoformat() if row['completed_at'] else None,
+    }
+
+
+def _fingerprint_row(row) -> Dict[str, Any]:
+    return {
+        'velocity_last_update': row['velocity_last_update'].isoformat() if row['velocity_last_update'] else None,
+        'velocity_rows': row['velocity_rows'],
+        'tasks_last_update': row['tasks_last_update'].isoformat() if row['tasks_last_update'] else None,
+        'tasks_rows': row['tasks_rows'],
+    }
+
 
 class DataService:
     """Service for data retrieval and processing."""
@@ -16,30 +60,51 @@ class DataService:
     def __init__(self):
         self.db_pool = None
         self.http_client = None
+        self._connect_lock = asyncio.Lock()
+        self._next_connect_attempt = 0.0
     
     async def initialize(self):
         """Initialize database connection and HTTP client."""
         try:
-            # Initialize database pool
-            self.db_pool = await asyncpg.create_pool(
-                settings.DATABASE_URL,
-                min_size=2,
-                max_size=10,
-                command_timeout=60
-            )
-            
-            # Initialize HTTP client
+            # Initialize HTTP client first so the API fallback works without a database
             self.http_client = httpx.AsyncClient(
                 base_url=settings.KANBAN_API_URL,
                 timeout=30.0
             )
             
+            await self._connect()
+            
             logger.info("✅ Data service initialized")
             
         except Exception as e:
-            logger.error(f"❌ Failed to initialize data service: {e}")
+            logger.error("❌ Failed to initialize data service: {}", e)
             raise
     
+    async def _connect(self):
+        """Create the database pool with pre-warmed connections."""
+        self._next_connect_attempt = time.monotonic() + DB_RECONNECT_INTERVAL
+        self.db_pool = await asyncpg.create_pool(
+            settings.DATABASE_URL,
+            min_size=5,
+            max_size=10,
+            command_timeout=60,
+            statement_cache_size=1024
+        )
+    
+    async def _get_pool(self) -> asyncpg.Pool:
+        """Get the database pool, reconnecting if it couldn't be created earlier."""
+        if self.db_pool is None:
+            async with self._connect_lock:
+                if self.db_pool is None:
+                    # Throttle attempts so a down database isn't hit on every query
+                    if time.monotonic() < self._next_connect_attempt:
+                        raise ConnectionError("Database unavailable")
+                    
+                    await self._connect()
+                    logger.info("✅ Database pool reconnected")
+        
+        return self.db_pool
+    
     async def close(self):
         """Close connections."""
         if self.db_pool:
@@ -48,12 +113,16 @@ class DataService:
         if self.http_client:
             await self.http_client.aclose()
     
+    async def _stream_rows(self, query: str, *args) -> AsyncIterator[asyncpg.Record]:
+        """Stream rows through a server-side cursor instead of materializing them."""
+        async with (await self._get_pool()).acquire() as conn:
+            async with conn.transaction():
+                async for row in conn.cursor(query, *args, prefetch=STREAM_PREFETCH):
+                    yield row
+    
     async def get_velocity_history(self, board_id: str, weeks: int = 12) -> List[Dict[str, Any]]:
         """Get velocity history for a board."""
         try:
-            if not self.db_pool:
-                await self.initialize()
-            
             query = """
                 SELECT 
                     sprint_week,
@@ -69,33 +138,19 @@ class DataService:
                 LIMIT $2
             """
             
-            async with self.db_pool.acquire() as conn:
+            async with (await self._get_pool()).acquire() as conn:
                 rows = await conn.fetch(query, board_id, weeks)
                 
-                return [
-                    {
-                        'sprint_week': row['sprint_week'],
-                        'velocity': float(row['velocity']),
-                        'completed': row['completed'],
-                        'total_story_points': row['total_points'],
-                        'cycle_time': float(row['cycle_time']),
-                        'throughput': row['throughput'],
-                        'created_at': row['created_at'].isoformat(),
-                    }
-                    for row in rows
-                ]
+                return [_velocity_row(row) for row in rows]
                 
         except Exception as e:
-            logger.error(f"❌ Failed to get velocity history: {e}")
+            logger.error("❌ Failed to get velocity history: {}", e)
             # Fallback to API if database fails
             return await self.get_velocity_history_from_api(board_id)
     
     async def get_velocity_history_from_api(self, board_id: str) -> List[Dict[str, Any]]:
         """Get velocity history from main API as fallback."""
         try:
-            if not self.http_client:
-                await self.initialize()
-            
             response = await self.http_client.get(f"/api/analytics/board/{board_id}/velocity")
             response.raise_for_status()
             
@@ -103,15 +158,12 @@ class DataService:
             return data.get('weeklyMetrics', [])
             
         except Exception as e:
-            logger.error(f"❌ Failed to get velocity from API: {e}")
+            logger.error("❌ Failed to get velocity from API: {}", e)
             return []
     
     async def get_board_tasks(self, board_id: str, include_completed: bool = False) -> List[Dict[str, Any]]:
         """Get tasks for a board."""
         try:
-            if not self.db_pool:
-                await self.initialize()
-            
             query = """
                 SELECT 
                     id,
@@ -133,54 +185,108 @@ class DataService:
             
             query += " ORDER BY created_at DESC"
             
-            async with self.db_pool.acquire() as conn:
-                rows = await conn.fetch(query, board_id)
-                
-                return [
-                    {
-                        'id': str(row['id']),
-                        'title': row['title'],
-                        'description': row['description'] or '',
-                        'priority': row['priority'],
-                        'storyPoints': row['story_points'],
-                        'assigneeId': str(row['assignee_id']) if row['assignee_id'] else None,
-                        'dueDate': row['due_date'].isoformat() if row['due_date'] else None,
-                        'createdAt': row['created_at'].isoformat(),
-                        'updatedAt': row['updated_at'].isoformat(),
-                        'completedAt': row['completed_at'].isoformat() if row['completed_at'] else None,
-                    }
-                    for row in rows
-                ]
+            return [_task_row(row) async for row in self._stream_rows(query, board_id)]
                 
         except Exception as e:
-            logger.error(f"❌ Failed to get board tasks: {e}")
+            logger.error("❌ Failed to get board tasks: {}", e)
             # Fallback to API
             return await self.get_board_tasks_from_api(board_id)
     
     async def get_board_tasks_from_api(self, board_id: str) -> List[Dict[str, Any]]:
         """Get tasks from main API as fallback."""
         try:
-            if not self.http_client:
-                await self.initialize()
-            
             response = await self.http_client.get(f"/api/tasks?boardId={board_id}")
             response.raise_for_status()
             
             return response.json()
             
         except Exception as e:
-            logger.error(f"❌ Failed to get tasks from API: {e}")
+            logger.error("❌ Failed to get tasks from API: {}", e)
             return []
     
+    async def get_velocity_history_bulk(self, board_ids: List[str], weeks: int = 12) -> Dict[str, List[Dict[str, Any]]]:
+        """Get velocity history for several boards in one query."""
+        try:
+            query = """
+                SELECT 
+                    board_id,
+                    sprint_week,
+                    velocity,
+                    completed,
+                    total_points,
+                    cycle_time,
+                    throughput,
+                    created_at
+                FROM (
+                    SELECT 
+                        *,
+                        ROW_NUMBER() OVER (PARTITION BY board_id ORDER BY sprint_week DESC) AS week_rank
+                    FROM velocity_metrics 
+                    WHERE board_id = ANY($1::uuid[])
+                ) ranked
+                WHERE week_rank <= $2
+                ORDER BY board_id, sprint_week DESC
+            """
+            
+            async with (await self._get_pool()).acquire() as conn:
+                rows = await conn.fetch(query, board_ids, weeks)
+            
+            history = defaultdict(list)
+            for row in rows:
+                history[str(row['board_id'])].append(_velocity_row(row))
+            
+            return history
+            
+        except Exception as e:
+            logger.error("❌ Failed to get bulk velocity history: {}", e)
+            # Fallback to API if database fails
+            results = await asyncio.gather(*(self.get_velocity_history_from_api(board_id) for board_id in board_ids))
+            return dict(zip(board_ids, results))
+    
+    async def get_board_tasks_bulk(self, board_ids: List[str], include_completed: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """Get tasks for several boards in one query."""
+        try:
+            query = """
+                SELECT 
+                    board_id,
+                    id,
+                    title,
+                    description,
+                    priority,
+                    story_points,
+                    assignee_id,
+                    due_date,
+                    created_at,
+                    updated_at,
+                    completed_at
+                FROM tasks 
+                WHERE board_id = ANY($1::uuid[])
+            """
+            
+            if not include_completed:
+                query += " AND completed_at IS NULL"
+            
+            query += " ORDER BY board_id, created_at DESC"
+            
+            # Group rows as they arrive rather than holding the full result set
+            tasks = defaultdict(list)
+            async for row in self._stream_rows(query, board_ids):
+                tasks[str(row['board_id'])].append(_task_row(row))
+            
+            return tasks
+            
+        except Exception as e:
+            logger.error("❌ Failed to get bulk board tasks: {}", e)
+            # Fallback to API
+            results = await asyncio.gather(*(self.get_board_tasks_from_api(board_id) for board_id in board_ids))
+            return dict(zip(board_ids, results))
+    
     async def get_all_boards(self) -> List[Dict[str, Any]]:
         """Get all board IDs for training."""
         try:
-            if not self.db_pool:
-                await self.initialize()
-            
             query = "SELECT id, name FROM boards ORDER BY created_at DESC"
             
-            async with self.db_pool.acquire() as conn:
+            async with (await self._get_pool()).acquire() as conn:
                 rows = await conn.fetch(query)
                 
                 return [
@@ -192,32 +298,132 @@ class DataService:
                 ]
                 
         except Exception as e:
-            logger.error(f"❌ Failed to get boards: {e}")
+            logger.error("❌ Failed to get boards: {}", e)
             return []
     
+    async def get_training_board_ids(self, board_id: Optional[str] = None) -> List[str]:
+        """Resolve the boards to train on."""
+        if board_id:
+            return [board_id]
+        return [board['id'] for board in await self.get_all_boards()]
+    
+    async def get_velocity_training_data(self, board_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get velocity training data for the given boards."""
+        velocity_by_board = await self.get_velocity_history_bulk(board_ids, weeks=26)  # 6 months
+        return [row for rows in velocity_by_board.values() for row in rows]
+    
+    async def get_tasks_training_data(self, board_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get task training data for the given boards."""
+        tasks_by_board = await self.get_board_tasks_bulk(board_ids, include_completed=True)
+        return [task for tasks in tasks_by_board.values() for task in tasks]
+    
+    async def get_training_data_for_boards(self, board_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get training data for several boards, split per board.
+        
+        Each data type is fetched for all boards in one query and grouped by
+        board, rather than querying once per board.
+        """
+        velocity_by_board, tasks_by_board = await asyncio.gather(
+            self.get_velocity_history_bulk(board_ids, weeks=26),  # 6 months
+            self.get_board_tasks_bulk(board_ids, include_completed=True),
+        )
+        
+        training_data = {}
+        for board_id in board_ids:
+            velocity_data = velocity_by_board.get(board_id, [])
+            tasks_data = tasks_by_board.get(board_id, [])
+            training_data[board_id] = {
+                'velocity_data': velocity_data,
+                'tasks_data': tasks_data,
+                'boards_count': 1,
+                'data_points': {
+                    'velocity': len(velocity_data),
+                    'tasks': len(tasks_data),
+                }
+            }
+        
+        return training_data
+    
+    async def get_data_fingerprint(self, board_ids: List[str]) -> Optional[Dict[str, Any]]:
+        """Get a cheap summary that changes whenever the training data does."""
+        try:
+            query = """
+                SELECT 
+                    v.last_update AS velocity_last_update,
+                    v.row_count AS velocity_rows,
+                    t.last_update AS tasks_last_update,
+                    t.row_count AS tasks_rows
+                FROM (
+                    SELECT MAX(created_at) AS last_update, COUNT(*) AS row_count
+                    FROM velocity_metrics 
+                    WHERE board_id = ANY($1::uuid[])
+                ) v
+                CROSS JOIN (
+                    SELECT MAX(updated_at) AS last_update, COUNT(*) AS row_count
+                    FROM tasks 
+                    WHERE board_id = ANY($1::uuid[])
+                ) t
+            """
+            
+            async with (await self._get_pool()).acquire() as conn:
+                row = await conn.fetchrow(query, board_ids)
+            
+            return _fingerprint_row(row)
+            
+        except Exception as e:
+            logger.error("❌ Failed to get data fingerprint: {}", e)
+            return None
+    
+    async def get_data_fingerprints(self, board_ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Get the data fingerprint of each board in one query."""
+        try:
+            query = """
+                WITH v AS (
+                    SELECT board_id, MAX(created_at) AS last_update, COUNT(*) AS row_count
+                    FROM velocity_metrics 
+                    WHERE board_id = ANY($1::uuid[])
+                    GROUP BY board_id
+                ), t AS (
+                    SELECT board_id, MAX(updated_at) AS last_update, COUNT(*) AS row_count
+                    FROM tasks 
+                    WHERE board_id = ANY($1::uuid[])
+                    GROUP BY board_id
+                )
+                SELECT 
+                    boards.board_id,
+                    v.last_update AS velocity_last_update,
+                    COALESCE(v.row_count, 0) AS velocity_rows,
+                    t.last_update AS tasks_last_update,
+                    COALESCE(t.row_count, 0) AS tasks_rows
+                FROM unnest($1::uuid[]) AS boards (board_id)
+                LEFT JOIN v USING (board_id)
+                LEFT JOIN t USING (board_id)
+            """
+            
+            async with (await self._get_pool()).acquire() as conn:
+                rows = await conn.fetch(query, board_ids)
+            
+            return {str(row['board_id']): _fingerprint_row(row) for row in rows}
+            
+        except Exception as e:
+            logger.error("❌ Failed to get data fingerprints: {}", e)
+            return None
+    
     async def get_training_data(self, board_id: Optional[str] = None) -> Dict[str, Any]:
         """Get comprehensive training data."""
         try:
-            boards = [{'id': board_id}] if board_id else await self.get_all_boards()
-            
-            all_velocity_data = []
-            all_tasks_data = []
+            board_ids = await self.get_training_board_ids(board_id)
             
-            for board in boards:
-                board_id = board['id']
-                
-                # Get velocity data
-                velocity_data = await self.get_velocity_history(board_id, weeks=26)  # 6 months
-                all_velocity_data.extend(velocity_data)
-                
-                # Get tasks data
-                tasks_data = await self.get_board_tasks(board_id, include_completed=True)
-                all_tasks_data.extend(tasks_data)
+            # One query per data type for all boards, run concurrently
+            all_velocity_data, all_tasks_data = await asyncio.gather(
+                self.get_velocity_training_data(board_ids),
+                self.get_tasks_training_data(board_ids),
+            )
             
             return {
                 'velocity_data': all_velocity_data,
                 'tasks_data': all_tasks_data,
-                'boards_count': len(boards),
+                'boards_count': len(board_ids),
                 'data_points': {
                     'velocity': len(all_velocity_data),
                     'tasks': len(all_tasks_data),
@@ -225,5 +431,5 @@ class DataService:
             }
             
         except Exception as e:
-            logger.error(f"❌ Failed to get training data: {e}")
+            logger.error("❌ Failed to get training data: {}", e)
             raise
@@ -1,155 +1,787 @@
 import asyncio
-from typing import Optional
-from datetime import datetime, timedelta
+import dataclasses
+import functools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+from datetime import datetime
+from cachetools import LRUCache
 from loguru import logger
 
 from app.config import get_settings
+from app.models.predictor import VelocityPredictor
+from app.models.risk_analyzer import RiskAnalyzer
+from app.services.cache import ResponseCache
 from app.services.data_service import DataService
 
 settings = get_settings()
 
+# Model fits run here so they don't block the event loop
+_TRAIN_POOL_WORKERS = 2
+_TRAIN_POOL = ThreadPoolExecutor(max_workers=_TRAIN_POOL_WORKERS, thread_name_prefix="trainer")
+
+# Each board fits two models at once, so this many boards fill the pool
+_BOARDS_IN_FLIGHT = max(1, _TRAIN_POOL_WORKERS // 2)
+
+
+def _without_none(obj) -> dict:
+    """Shallow dict of a dataclass, leaving out unset fields."""
+    return {
+        field.name: getattr(obj, field.name)
+        for field in dataclasses.fields(obj)
+        if getattr(obj, field.name) is not None
+    }
+
+
+@dataclass(slots=True)
+class ModelResult:
+    """Outcome of training a single model."""
+    status: str
+    mode: Optional[str] = None
+    metrics: Optional[dict] = None
+    data_points: Optional[int] = None
+    reason: Optional[str] = None
+    error: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        return _without_none(self)
+
+
+@dataclass(slots=True)
+class TrainingResults:
+    """Outcome of a retraining run."""
+    velocity_model: Optional[ModelResult] = None
+    risk_model: Optional[ModelResult] = None
+    completed_at: Optional[str] = None
+    board_id: Optional[str] = None
+    training_data: Optional[dict] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        """Plain dict for JSON responses, in the shape callers already expect."""
+        result = _without_none(self)
+        # A completed run always reports its board, null meaning all boards
+        if self.completed_at is not None:
+            result['board_id'] = self.board_id
+        for key in ('velocity_model', 'risk_model'):
+            if key in result:
+                result[key] = result[key].to_dict()
+        return result
+
+
+def _sample_count(fingerprint: dict) -> int:
+    """Total rows behind a data fingerprint."""
+    return (fingerprint.get('velocity_rows') or 0) + (fingerprint.get('tasks_rows') or 0)
+
+
+@dataclass(slots=True)
+class _ModelEntry:
+    """A model kept across cycles and the newest row timestamp it was fitted on."""
+    model: Any
+    fitted_through: Optional[datetime] = None
+
+
+def _train_sync(model, method: str = "train", **kwargs):
+    """Train a model synchronously on the calling thread."""
+    if hasattr(model, f"{method}_sync"):
+        return getattr(model, f"{method}_sync")(**kwargs)
+    return asyncio.run(getattr(model, method)(**kwargs))
+
+
+async def _train_in_pool(model, method: str = "train", **kwargs):
+    """Train a model on the trainer thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_TRAIN_POOL, functools.partial(_train_sync, model, method, **kwargs))
+
+
+def _rows_since(rows: list, timestamp_key: str, since: datetime) -> list:
+    """Rows whose ISO timestamp is later than ``since``."""
+    since = since.astimezone()
+    new_rows = []
+    
+    for row in rows:
+        try:
+            if datetime.fromisoformat(row[timestamp_key]).astimezone() > since:
+                new_rows.append(row)
+        except (KeyError, TypeError, ValueError):
+            continue
+    
+    return new_rows
+
+
+def _latest_timestamp(rows: list, timestamp_key: str) -> Optional[datetime]:
+    """Latest ISO timestamp found in ``rows``."""
+    latest = None
+    
+    for row in rows:
+        try:
+            timestamp = datetime.fromisoformat(row[timestamp_key])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if latest is None or timestamp.astimezone() > latest.astimezone():
+            latest = timestamp
+    
+    return latest
+
+
+def train_models_sync(
+    velocity_data: Optional[list],
+    tasks_data: Optional[list],
+    board_id: Optional[str] = None
+) -> dict:
+    """Train and save models; runs inside a worker process."""
+    return asyncio.run(_train_and_save_models(velocity_data, tasks_data, board_id))
+
+
+async def _train_and_save_models(
+    velocity_data: Optional[list],
+    tasks_data: Optional[list],
+    board_id: Optional[str]
+) -> dict:
+    results = {}
+
+    # Train velocity predictor if data provided
+    if velocity_data:
+        try:
+            velocity_predictor = VelocityPredictor()
+            results["velocity_model"] = await velocity_predictor.train(
+                velocity_data=velocity_data,
+                board_id=board_id
+            )
+            await velocity_predictor.save_model()
+        except Exception as e:
+            results["velocity_model"] = {"error": str(e)}
+
+    # Train risk analyzer if data provided
+    if tasks_data:
+        try:
+            risk_analyzer = RiskAnalyzer()
+            results["risk_model"] = await risk_analyzer.train(
+                tasks_data=tasks_data,
+                board_id=board_id
+            )
+            await risk_analyzer.save_model()
+        except Exception as e:
+            results["risk_model"] = {"error": str(e)}
+
+    return results
+
 
 class TrainingService:
     """Service for managing model training and retraining."""
     
-    def __init__(self):
-        self.data_service = DataService()
-        self.is_training = False
-        self.last_training = None
+    def __init__(
+        self,
+        data_service: Optional[DataService] = None,
+        on_models_saved: Optional[Callable[[set], Awaitable[None]]] = None,
+        process_pool: Optional[Executor] = None
+    ):
+        self.data_service = data_service or DataService()
+        # Runs train_models_sync for caller-supplied data
+        self._process_pool = process_pool
+        # Called with the model kinds whose all-boards checkpoint was rewritten
+        self._on_models_saved = on_models_saved
+        self._train_lock = asyncio.Lock()
+        # Job key -> queued or running task, shared by callers asking for the same job
+        self._inflight: dict = {}
+        self.last_training = None  # Wall-clock time, for display
+        self._last_training_mono: Optional[float] = None  # Monotonic time, for interval checks
         self.training_task = None
+        self._interval_s = settings.RETRAIN_INTERVAL_HOURS * 3600  # Convert hours to seconds
+        # Monotonic deadline for the next scheduled run; _wake reschedules early
+        self._next_deadline = time.monotonic() + self._interval_s
+        self._wake = asyncio.Event()
+        # board_id -> data fingerprint of the last successful run
+        self._fingerprints: dict = {}
+        # board_id -> fingerprint row count of the last successful run
+        self._sample_counts: dict = {}
+        # (model kind, board_id) -> _ModelEntry, least recently trained evicted first
+        self._models = LRUCache(maxsize=settings.TRAINING_MODEL_CACHE_SIZE)
+        # model kind -> newest row timestamp in the saved all-boards checkpoint
+        self._checkpoint_marks: dict = {}
+        # board_id -> digest of the last caller-supplied data trained on
+        self._submitted_digests: dict = {}
+        self._state_path = Path(settings.STATE_DIR) / "training_state.json"
+        self._load_state()
     
     async def schedule_retraining(self):
         """Schedule periodic retraining."""
         while True:
             try:
-                await asyncio.sleep(settings.RETRAIN_INTERVAL_HOURS * 3600)  # Convert hours to seconds
+                timeout = max(0, self._next_deadline - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                
+                # A completed retrain moved the deadline; wait for the new one
+                if self._wake.is_set():
+                    self._wake.clear()
+                    continue
                 
                 if not self.is_training:
                     logger.info("🔄 Starting scheduled retraining")
                     await self.retrain_models()
                 else:
                     logger.info("⏭️ Skipping scheduled retraining (already in progress)")
+                
+                self._wake.clear()
+                self._next_deadline = time.monotonic() + self._interval_s
                     
             except asyncio.CancelledError:
                 logger.info("📅 Training scheduler cancelled")
                 break
             except Exception as e:
-                logger.error(f"❌ Scheduled retraining failed: {e}")
+                logger.error("❌ Scheduled retraining failed: {}", e)
                 # Continue the loop even if training fails
-                await asyncio.sleep(3600)  # Wait 1 hour before retrying
+                self._next_deadline = time.monotonic() + 3600  # Wait 1 hour before retrying
+    
+    async def retrain_models(self, board_id: Optional[str] = None, force: bool = False) -> dict:
+        """Retrain all models with fresh data.
+        
+        Skips training when the source data hasn't changed since the last
+        successful run, unless ``force`` is set.
+        """
+        return await self._run_coalesced(
+            ('retrain', board_id, force),
+            functools.partial(self._do_retrain, board_id, force)
+        )
+    
+    async def retrain_all_boards(self, board_ids: Optional[list] = None, force: bool = False) -> dict:
+        """Retrain a separate model pair for each board.
+        
+        Fingerprints and data for every board are fetched in one round-trip
+        per query, then the per-board fits run concurrently on the trainer
+        pool. Boards whose data hasn't changed enough are skipped unless
+        ``force`` is set. The fitted models stay in the in-memory model
+        cache only; they are not checkpointed or served.
+        """
+        return await self._run_coalesced(
+            ('all_boards', tuple(board_ids or ()), force),
+            functools.partial(self._do_retrain_all_boards, board_ids, force)
+        )
+    
+    async def train_on_data(
+        self,
+        velocity_data: Optional[list],
+        tasks_data: Optional[list],
+        board_id: Optional[str] = None,
+        force: bool = False
+    ) -> dict:
+        """Train and save models on caller-supplied data in the process pool.
+        
+        Resubmitting the data last trained on for a board is skipped unless
+        ``force`` is set.
+        """
+        digest = ResponseCache.make_key("train", {
+            'velocity_data': velocity_data,
+            'tasks_data': tasks_data,
+            'board_id': board_id,
+        })
+        return await self._run_coalesced(
+            ('train_on_data', digest, force),
+            functools.partial(self._do_train_on_data, velocity_data, tasks_data, board_id, force, digest)
+        )
+    
+    async def _run_coalesced(self, key: tuple, run: Callable[[], Awaitable[dict]]) -> dict:
+        """Run a training job under the training lock.
+        
+        Callers asking for the same job while it is queued or running share
+        that run and all get its result. Other jobs wait for the lock and run
+        afterwards, one at a time, since they share the trainer pool and the
+        checkpoint files.
+        """
+        task = self._inflight.get(key)
+        
+        if task is None:
+            task = asyncio.create_task(self._run_locked(run))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shield so one caller going away doesn't cancel the run for the rest
+        return await asyncio.shield(task)
     
-    async def retrain_models(self, board_id: Optional[str] = None) -> dict:
-        """Retrain all models with fresh data."""
-        if self.is_training:
-            logger.warning("⚠️ Training already in progress")
-            return {"status": "already_training"}
+    async def _run_locked(self, run: Callable[[], Awaitable[dict]]) -> dict:
+        async with self._train_lock:
+            return await run()
+    
+    async def _do_train_on_data(
+        self,
+        velocity_data: Optional[list],
+        tasks_data: Optional[list],
+        board_id: Optional[str],
+        force: bool,
+        digest: str
+    ) -> dict:
+        """Run one training job on supplied data; the caller holds the training lock."""
+        if not force and self._submitted_digests.get(board_id) == digest:
+            logger.info("⏭️ Skipping training (data unchanged since last submission)")
+            return {"status": "skipped_no_new_data", "board_id": board_id}
+        
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self._process_pool, train_models_sync, velocity_data, tasks_data, board_id
+            )
+        except Exception as e:
+            logger.error("❌ Background training failed: {}", e)
+            return {"status": "failed", "error": str(e)}
         
-        self.is_training = True
-        training_results = {}
+        saved = {
+            kind
+            for kind, key in (('velocity', 'velocity_model'), ('risk', 'risk_model'))
+            if key in results and "error" not in results[key]
+        }
         
+        if saved:
+            self._submitted_digests[board_id] = digest
+            
+            # The worker rewrote these checkpoints: drop the in-memory copies so
+            # the next scheduled fit reloads them and refits in full
+            for kind in saved:
+                self._models.pop((kind, None), None)
+                self._checkpoint_marks.pop(kind, None)
+            
+            await self._notify_models_saved(saved)
+        
+        statuses = {
+            kind: 'success' if kind in saved else ('failed' if key in results else 'skipped')
+            for kind, key in (('velocity', 'velocity_model'), ('risk', 'risk_model'))
+        }
+        logger.info(
+            "✅ Background training completed: velocity={}, risk={}",
+            statuses['velocity'],
+            statuses['risk']
+        )
+        logger.opt(lazy=True).debug(
+            "Background training results: {}",
+            lambda: json.dumps(results, default=str)
+        )
+        return results
+    
+    async def _do_retrain_all_boards(self, board_ids: Optional[list], force: bool) -> dict:
+        """Run one per-board retrain; the caller holds the training lock."""
         try:
-            logger.info(f"🎯 Starting model retraining for board: {board_id or 'all boards'}")
+            board_ids = board_ids or await self.data_service.get_training_board_ids()
+            logger.info("🎯 Starting per-board retraining for {} boards", len(board_ids))
             
-            # Get training data
-            training_data = await self.data_service.get_training_data(board_id)
+            fingerprints = await self.data_service.get_data_fingerprints(board_ids) or {}
             
-            logger.info(f"📊 Training data retrieved: {training_data['data_points']}")
+            results = {}
+            if not force:
+                for board_id in board_ids:
+                    skipped = self._skip_reason(board_id, fingerprints.get(board_id))
+                    if skipped is not None:
+                        results[board_id] = skipped
             
-            # Import models here to avoid circular imports
-            from app.models.predictor import VelocityPredictor
-            from app.models.risk_analyzer import RiskAnalyzer
+            stale_ids = [board_id for board_id in board_ids if board_id not in results]
+            data_by_board = await self.data_service.get_training_data_for_boards(stale_ids) if stale_ids else {}
             
-            # Train velocity predictor
-            try:
-                velocity_predictor = VelocityPredictor()
-                
-                if training_data['velocity_data']:
-                    velocity_metrics = await velocity_predictor.train(
-                        velocity_data=training_data['velocity_data'],
-                        board_id=board_id
-                    )
-                    training_results['velocity_model'] = {
-                        'status': 'success',
-                        'metrics': velocity_metrics,
-                        'data_points': len(training_data['velocity_data'])
-                    }
-                    logger.info("✅ Velocity model retraining completed")
-                else:
-                    training_results['velocity_model'] = {
-                        'status': 'skipped',
-                        'reason': 'insufficient_data'
-                    }
-                    logger.warning("⚠️ Skipped velocity model training (insufficient data)")
-                    
-            except Exception as e:
-                logger.error(f"❌ Velocity model retraining failed: {e}")
-                training_results['velocity_model'] = {
-                    'status': 'failed',
-                    'error': str(e)
-                }
+            semaphore = asyncio.Semaphore(_BOARDS_IN_FLIGHT)
             
-            # Train risk analyzer
-            try:
-                risk_analyzer = RiskAnalyzer()
+            async def train_board(board_id: str) -> dict:
+                async with semaphore:
+                    training_data = data_by_board[board_id]
+                    velocity_result, risk_result = await self._train_models(training_data, board_id, full=force)
                 
-                if training_data['tasks_data']:
-                    risk_metrics = await risk_analyzer.train(
-                        tasks_data=training_data['tasks_data'],
-                        board_id=board_id
-                    )
-                    training_results['risk_model'] = {
-                        'status': 'success',
-                        'metrics': risk_metrics,
-                        'data_points': len(training_data['tasks_data'])
-                    }
-                    logger.info("✅ Risk model retraining completed")
-                else:
-                    training_results['risk_model'] = {
-                        'status': 'skipped',
-                        'reason': 'insufficient_data'
-                    }
-                    logger.warning("⚠️ Skipped risk model training (insufficient data)")
-                    
-            except Exception as e:
-                logger.error(f"❌ Risk model retraining failed: {e}")
-                training_results['risk_model'] = {
-                    'status': 'failed',
-                    'error': str(e)
-                }
+                board_results = TrainingResults(
+                    velocity_model=velocity_result,
+                    risk_model=risk_result,
+                    training_data=training_data['data_points'],
+                )
+                
+                if 'success' not in (velocity_result.status, risk_result.status):
+                    board_results.status = 'failed'
+                    return board_results.to_dict()
+                
+                fingerprint = fingerprints.get(board_id)
+                if fingerprint is not None:
+                    self._fingerprints[board_id] = fingerprint
+                    self._sample_counts[board_id] = _sample_count(fingerprint)
+                
+                board_results.completed_at = datetime.now().isoformat()
+                board_results.board_id = board_id
+                return board_results.to_dict()
+            
+            trained = await asyncio.gather(*(train_board(board_id) for board_id in stale_ids))
+            results.update(zip(stale_ids, trained))
+            
+            succeeded = [result for result in trained if 'completed_at' in result]
+            if succeeded:
+                self._record_run(None, {
+                    'velocity': sum(result['training_data']['velocity'] for result in succeeded),
+                    'tasks': sum(result['training_data']['tasks'] for result in succeeded),
+                })
+            
+            logger.info(
+                "🎉 Per-board retraining completed: {} trained, {} failed, {} skipped",
+                len(succeeded),
+                len(trained) - len(succeeded),
+                len(board_ids) - len(trained)
+            )
+            
+            return {
+                'status': 'completed',
+                'boards': {board_id: results[board_id] for board_id in board_ids},
+                'completed_at': datetime.now().isoformat(),
+            }
+            
+        except Exception as e:
+            logger.error("❌ Per-board retraining failed: {}", e)
+            return {
+                'status': 'failed',
+                'error': str(e)
+            }
+    
+    @property
+    def is_training(self) -> bool:
+        """Whether a retrain is currently running."""
+        return self._train_lock.locked()
+    
+    async def _do_retrain(self, board_id: Optional[str], force: bool) -> dict:
+        """Run one retrain; the caller holds the training lock."""
+        training_results = TrainingResults()
+        
+        try:
+            logger.info("🎯 Starting model retraining for board: {}", board_id or 'all boards')
+            
+            board_ids = await self.data_service.get_training_board_ids(board_id)
+            
+            # Compare a cheap fingerprint against the data we last trained on
+            fingerprint = await self.data_service.get_data_fingerprint(board_ids)
+            
+            if not force:
+                skipped = self._skip_reason(board_id, fingerprint)
+                if skipped is not None:
+                    return skipped
+            
+            training_data, velocity_result, risk_result = await self._fetch_and_train(board_ids, board_id, full=force)
+            
+            logger.info("📊 Training data retrieved: {}", training_data['data_points'])
+            
+            training_results.velocity_model = velocity_result
+            training_results.risk_model = risk_result
+            
+            # A run where no model trained must not count as done, or the
+            # fingerprint check would keep skipping the retry
+            if 'success' not in (velocity_result.status, risk_result.status):
+                logger.warning(
+                    "⚠️ Model retraining produced no model: velocity={}, risk={}",
+                    velocity_result.status,
+                    risk_result.status
+                )
+                training_results.status = 'failed'
+                return training_results.to_dict()
+            
+            if fingerprint is not None:
+                self._fingerprints[board_id] = fingerprint
+                self._sample_counts[board_id] = _sample_count(fingerprint)
             
             # Update training metadata
-            self.last_training = datetime.now()
-            training_results['completed_at'] = self.last_training.isoformat()
-            training_results['board_id'] = board_id
-            training_results['training_data'] = training_data['data_points']
+            self._record_run(board_id, training_data['data_points'])
+            training_results.completed_at = self.last_training.isoformat()
+            training_results.board_id = board_id
+            training_results.training_data = training_data['data_points']
+            
+            if board_id is None:
+                await self._notify_models_saved({
+                    kind
+                    for kind, result in (('velocity', velocity_result), ('risk', risk_result))
+                    if result.status == 'success'
+                })
             
-            logger.info(f"🎉 Model retraining completed: {training_results}")
+            logger.info(
+                "🎉 Model retraining completed: velocity={}, risk={}, data_points={}",
+                velocity_result.status,
+                risk_result.status,
+                training_data['data_points']
+            )
+            response = training_results.to_dict()
+            logger.opt(lazy=True).debug(
+                "Model retraining results: {}",
+                lambda: json.dumps(response, default=str)
+            )
             
-            return training_results
+            return response
             
         except Exception as e:
-            logger.error(f"❌ Model retraining failed: {e}")
-            training_results['error'] = str(e)
-            training_results['status'] = 'failed'
-            return training_results
+            logger.error("❌ Model retraining failed: {}", e)
+            training_results.error = str(e)
+            training_results.status = 'failed'
+            return training_results.to_dict()
+    
+    def _skip_reason(self, board_id: Optional[str], fingerprint: Optional[dict]) -> Optional[dict]:
+        """Result to return instead of training when the data hasn't changed enough."""
+        if fingerprint is not None and fingerprint == self._fingerprints.get(board_id):
+            logger.info("⏭️ Skipping retraining for {} (no new data)", board_id or 'all boards')
+            return {"status": "skipped_no_new_data", "board_id": board_id}
+        
+        new_samples = self._samples_below_watermark(board_id, fingerprint)
+        if new_samples is not None:
+            logger.info(
+                "⏭️ Skipping retraining for {} ({} new samples, below watermark)",
+                board_id or 'all boards',
+                new_samples
+            )
+            return {"status": "skipped_below_watermark", "new_samples": new_samples}
+        
+        return None
+    
+    def _record_run(self, board_id: Optional[str], data_points: dict):
+        """Record a successful run and push the next scheduled one out."""
+        self.last_training = datetime.now()
+        self._last_training_mono = time.monotonic()
+        self._save_state(board_id, data_points)
+        
+        # Push the next scheduled run a full interval out from now
+        self._next_deadline = time.monotonic() + self._interval_s
+        self._wake.set()
+    
+    async def _notify_models_saved(self, kinds: set):
+        """Let the serving side pick up rewritten checkpoints."""
+        if not kinds or self._on_models_saved is None:
+            return
+        
+        try:
+            await self._on_models_saved(kinds)
+        except Exception as e:
+            logger.error("❌ Failed to reload trained models: {}", e)
+    
+    def _samples_below_watermark(self, board_id: Optional[str], fingerprint: Optional[dict]) -> Optional[int]:
+        """New-sample count since the last run if it is too small to retrain on, else None."""
+        last_count = self._sample_counts.get(board_id)
+        if fingerprint is None or last_count is None:
+            return None
+        
+        # Rows added or removed since the last fit
+        new_samples = abs(_sample_count(fingerprint) - last_count)
+        if new_samples >= settings.RETRAIN_MIN_DELTA_ABS:
+            return None
+        if not last_count or new_samples / last_count >= settings.RETRAIN_MIN_DELTA_FRACTION:
+            return None
+        
+        return new_samples
+    
+    def _load_state(self):
+        """Restore the last training time persisted by a previous process."""
+        try:
+            if not self._state_path.exists():
+                return
             
+            state = json.loads(self._state_path.read_text())
+            self.last_training = datetime.fromisoformat(state['last_training'])
+            # Stored as pairs since the all-boards key is None
+            self._sample_counts = dict(state.get('sample_counts', []))
+            self._checkpoint_marks = {
+                kind: datetime.fromisoformat(mark)
+                for kind, mark in state.get('checkpoint_marks', {}).items()
+                if mark
+            }
+            
+            # Resume the schedule where the previous process left off
+            elapsed = (datetime.now() - self.last_training).total_seconds()
+            self._last_training_mono = time.monotonic() - elapsed
+            self._next_deadline = time.monotonic() + max(0, self._interval_s - elapsed)
+            
+            logger.info("📂 Restored training state (last training: {})", state['last_training'])
+            
+        except Exception as e:
+            logger.warning("⚠️ Failed to load training state: {}", e)
+    
+    def _save_state(self, board_id: Optional[str], data_points: dict):
+        """Atomically persist the last training time."""
+        tmp_path = None
+        try:
+            self._state_path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique temp name so concurrent writers never share a file
+            with tempfile.NamedTemporaryFile(
+                'w',
+                dir=self._state_path.parent,
+                prefix=self._state_path.stem,
+                suffix='.tmp',
+                delete=False
+            ) as tmp_file:
+                tmp_path = tmp_file.name
+                json.dump({
+                    'last_training': self.last_training.isoformat(),
+                    'board_id': board_id,
+                    'data_points': data_points,
+                    'sample_counts': list(self._sample_counts.items()),
+                    'checkpoint_marks': {
+                        kind: mark.isoformat() if mark else None
+                        for kind, mark in self._checkpoint_marks.items()
+                    },
+                }, tmp_file)
+            os.replace(tmp_path, self._state_path)
+            
+        except Exception as e:
+            logger.warning("⚠️ Failed to save training state: {}", e)
+            if tmp_path is not None:
+                Path(tmp_path).unlink(missing_ok=True)
+    
+    async def _fetch_and_train(self, board_ids: list, board_id: Optional[str], full: bool = False) -> tuple:
+        """Fetch fresh training data and train both models, overlapping I/O with fitting."""
+        # Start fetching task data now so it overlaps with velocity fitting
+        tasks_fetch = asyncio.create_task(self.data_service.get_tasks_training_data(board_ids))
+        
+        async def train_risk_when_ready() -> dict:
+            return await self._train_risk_model(await tasks_fetch, board_id, full)
+        
+        try:
+            velocity_data = await self.data_service.get_velocity_training_data(board_ids)
+            
+            # Velocity and risk models use disjoint data, so train them concurrently
+            async with asyncio.TaskGroup() as tg:
+                velocity_task = tg.create_task(self._train_velocity_model(velocity_data, board_id, full))
+                risk_task = tg.create_task(train_risk_when_ready())
         finally:
-            self.is_training = False
+            tasks_fetch.cancel()
+        
+        tasks_data = tasks_fetch.result()
+        training_data = {
+            'velocity_data': velocity_data,
+            'tasks_data': tasks_data,
+            'boards_count': len(board_ids),
+            'data_points': {
+                'velocity': len(velocity_data),
+                'tasks': len(tasks_data),
+            }
+        }
+        
+        return training_data, velocity_task.result(), risk_task.result()
+    
+    async def _train_models(self, training_data: dict, board_id: Optional[str], full: bool = False) -> tuple:
+        """Train both models concurrently on already-fetched data."""
+        async with asyncio.TaskGroup() as tg:
+            velocity_task = tg.create_task(self._train_velocity_model(training_data['velocity_data'], board_id, full))
+            risk_task = tg.create_task(self._train_risk_model(training_data['tasks_data'], board_id, full))
+        
+        return velocity_task.result(), risk_task.result()
+    
+    async def _train_velocity_model(self, velocity_data: list, board_id: Optional[str], full: bool = False) -> ModelResult:
+        """Train the velocity predictor; failures are reported, not raised."""
+        try:
+            if not velocity_data:
+                logger.warning("⚠️ Skipped velocity model training (insufficient data)")
+                return ModelResult(status='skipped', reason='insufficient_data')
+            
+            result = await self._fit(
+                'velocity', VelocityPredictor, 'velocity_data', velocity_data, 'created_at', board_id, full
+            )
+            logger.info("✅ Velocity model retraining completed ({})", result.mode or 'full')
+            return result
+            
+        except Exception as e:
+            logger.error("❌ Velocity model retraining failed: {}", e)
+            return ModelResult(status='failed', error=str(e))
+    
+    async def _train_risk_model(self, tasks_data: list, board_id: Optional[str], full: bool = False) -> ModelResult:
+        """Train the risk analyzer; failures are reported, not raised."""
+        try:
+            if not tasks_data:
+                logger.warning("⚠️ Skipped risk model training (insufficient data)")
+                return ModelResult(status='skipped', reason='insufficient_data')
+            
+            result = await self._fit(
+                'risk', RiskAnalyzer, 'tasks_data', tasks_data, 'updatedAt', board_id, full
+            )
+            logger.info("✅ Risk model retraining completed ({})", result.mode or 'full')
+            return result
+            
+        except Exception as e:
+            logger.error("❌ Risk model retraining failed: {}", e)
+            return ModelResult(status='failed', error=str(e))
+    
+    async def _get_model(self, kind: str, model_cls, board_id: Optional[str]) -> _ModelEntry:
+        """Get the model kept from earlier cycles, warm-starting the global one from disk."""
+        key = (kind, board_id)
+        entry = self._models.get(key)
+        
+        if entry is None:
+            entry = _ModelEntry(model_cls())
+            
+            # Only the all-boards model is persisted by the serving process
+            if board_id is None:
+                try:
+                    await entry.model.load_model()
+                    entry.fitted_through = self._checkpoint_marks.get(kind)
+                except Exception as e:
+                    logger.info("🔄 No {} checkpoint to warm-start from: {}", kind, e)
+            
+            self._models[key] = entry
+        
+        return entry
+    
+    async def _fit(
+        self,
+        kind: str,
+        model_cls,
+        data_arg: str,
+        data: list,
+        timestamp_key: str,
+        board_id: Optional[str],
+        full: bool = False
+    ) -> ModelResult:
+        """Fit a model incrementally on new rows when possible, otherwise on all rows."""
+        entry = await self._get_model(kind, model_cls, board_id)
+        model, since = entry.model, entry.fitted_through
+        
+        # Each model tracks its own cutoff so other boards' runs don't move it
+        new_rows = _rows_since(data, timestamp_key, since) if since else data
+        incremental = (
+            not full
+            and since is not None
+            and hasattr(model, 'train_incremental')
+            and len(new_rows) <= settings.RETRAIN_INCREMENTAL_MAX_FRACTION * len(data)
+        )
+        
+        if incremental:
+            if not new_rows:
+                return ModelResult(status='skipped', reason='no_new_data')
+            
+            metrics = await _train_in_pool(
+                model,
+                'train_incremental',
+                new_rows=new_rows,
+                since_ts=since
+            )
+        else:
+            metrics = await _train_in_pool(model, **{data_arg: data, 'board_id': board_id})
+        
+        entry.fitted_through = _latest_timestamp(new_rows if incremental else data, timestamp_key) or since
+        
+        # Checkpoint the all-boards model so a restart can warm-start from it
+        if board_id is None:
+            await model.save_model()
+            self._checkpoint_marks[kind] = entry.fitted_through
+        
+        return ModelResult(
+            status='success',
+            mode='incremental' if incremental else 'full',
+            metrics=metrics,
+            data_points=len(new_rows) if incremental else len(data)
+        )
     
-    async def is_retraining_needed(self) -> bool:
+    def is_retraining_needed(self) -> bool:
         """Check if retraining is needed based on time elapsed."""
-        if not self.last_training:
+        if self._last_training_mono is None:
             return True
         
-        time_since_training = datetime.now() - self.last_training
-        return time_since_training > timedelta(hours=settings.RETRAIN_INTERVAL_HOURS)
+        # Monotonic so wall-clock jumps can't delay or trigger retraining
+        return time.monotonic() - self._last_training_mono > self._interval_s
     
     def get_training_status(self) -> dict:
         """Get current training status."""
         return {
             'is_training': self.is_training,
             'last_training': self.last_training.isoformat() if self.last_training else None,
-            'retraining_needed': asyncio.run(self.is_retraining_needed()),
+            'retraining_needed': self.is_retraining_needed(),
             'next_scheduled_training': None,  # Could be calculated
             'training_interval_hours': settings.RETRAIN_INTERVAL_HOURS,
         }
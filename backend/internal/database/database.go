@@ -1,6 +1,8 @@
 package database
 
 import (
+	"fmt"
+
 	"kanopt/internal/models"
 
 	"gorm.io/driver/postgres"
@@ -19,8 +21,25 @@ func Connect(databaseURL string) (*gorm.DB, error) {
 	return db, nil
 }
 
+// Index names with the statements that build them. These back the AI
+// service's read queries on velocity_metrics and tasks.
+var indexes = []struct {
+	name string
+	ddl  string
+}{
+	{
+		name: "idx_velocity_board_week",
+		ddl:  `CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_velocity_board_week ON velocity_metrics (board_id, sprint_week DESC)`,
+	},
+	{
+		name: "idx_tasks_board_open",
+		ddl: `CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tasks_board_open ON tasks (board_id, created_at DESC) ` +
+			`INCLUDE (id, title, priority, story_points, assignee_id, due_date, updated_at) WHERE completed_at IS NULL`,
+	},
+}
+
 func Migrate(db *gorm.DB) error {
-	return db.AutoMigrate(
+	if err := db.AutoMigrate(
 		&models.Board{},
 		&models.Column{},
 		&models.Task{},
@@ -30,5 +49,49 @@ func Migrate(db *gorm.DB) error {
 		&models.Suggestion{},
 		&models.RiskPrediction{},
 		&models.VelocityMetric{},
-	)
+	); err != nil {
+		return err
+	}
+
+	return migrateIndexes(db)
+}
+
+// migrateIndexes builds the indexes without locking writes. CONCURRENTLY
+// cannot run inside a transaction, and a build that fails part way leaves an
+// INVALID index behind that IF NOT EXISTS would skip, so those are dropped
+// and rebuilt.
+func migrateIndexes(db *gorm.DB) error {
+	// Pin one connection so the session timeout applies to every statement
+	return db.Connection(func(conn *gorm.DB) error {
+		if err := conn.Exec("SET statement_timeout = 0").Error; err != nil {
+			return err
+		}
+
+		for _, index := range indexes {
+			var invalid bool
+			err := conn.Raw(
+				`SELECT EXISTS (
+					SELECT 1 FROM pg_index i
+					JOIN pg_class c ON c.oid = i.indexrelid
+					WHERE c.relname = ? AND NOT i.indisvalid
+				)`,
+				index.name,
+			).Scan(&invalid).Error
+			if err != nil {
+				return err
+			}
+
+			if invalid {
+				if err := conn.Exec("DROP INDEX CONCURRENTLY IF EXISTS " + index.name).Error; err != nil {
+					return err
+				}
+			}
+
+			if err := conn.Exec(index.ddl).Error; err != nil {
+				return fmt.Errorf("create index %s: %w", index.name, err)
+			}
+		}
+
+		return nil
+	})
 }